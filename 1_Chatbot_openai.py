@@ -1,15 +1,33 @@
 import openai
+from hedging import HedgingPolicy
+from semantic_cache import SemanticCache
 openai.api_key = 'your api key'
-def chat(prompt):
+def chat(prompt, hedging=None, cache=None):
+    if cache:
+        return cache.get_or_create(prompt, lambda: chat(prompt, hedging), namespace="chat")
+    messages = [{'role': 'user', 'content': prompt}]
+    if hedging:
+        return hedging.create_chat_completion(openai, "gpt-4", messages)
     response = openai.chat.completions.create(
         model="gpt-4",
-        messages= [{'role': 'user', 'content': prompt}]  
+        messages= messages  
     )
     return response.choices[0].message.content.strip()
 if __name__ == "__main__":
+    hedging = HedgingPolicy.from_env()
+    cache = SemanticCache.from_env(openai)
     while True: 
         abc = input("Type prompt:-->")
         if abc.lower() in ['exit', 'break', 'shutdown', 'shut down', 'close']:
             break
-        response = chat(abc)
+        if abc.lower() == 'wrong':
+            hit = cache.report_false_hit() if cache else None
+            print("Bot:-->", f"Dropped cached reply for: {hit['cached_prompt']}" if hit else "Last reply was not cached")
+            continue
+        response = chat(abc, hedging, cache)
         print("Bot:-->", response)
+    if hedging:
+        print("Hedging:-->", hedging.stats.summary())
+    if cache:
+        cache.save()
+        print("Cache:-->", cache.summary())
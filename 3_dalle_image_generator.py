@@ -5,6 +5,7 @@ from io import BytesIO
 from PIL import Image
 import openai
 from dotenv import load_dotenv
+from budget import BudgetExceeded, BudgetManager
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,12 +15,13 @@ class DALLEImageGenerator:
     A class to generate and manipulate images using OpenAI's DALL-E models.
     """
     
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, budget=None):
         """
         Initialize the OpenAI client with the API key.
         
         Args:
             api_key (str, optional): OpenAI API key. If not provided, will try to get from environment variable.
+            budget (BudgetManager, optional): Spend ceiling and usage accounting for generated images
         """
         # Use provided API key or try to get from environment
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
@@ -29,6 +31,7 @@ class DALLEImageGenerator:
             
         # Initialize the OpenAI client
         self.client = openai.OpenAI(api_key=self.api_key)
+        self.budget = budget
     
     def generate_image(self, prompt, size="1024x1024", quality="standard", n=1):
         """
@@ -42,20 +45,32 @@ class DALLEImageGenerator:
             
         Returns:
             list: List of image URLs or None if there was an error
+            
+        Raises:
+            BudgetExceeded: If the request does not fit the configured budget
         """
         try:
-            response = self.client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size=size,
-                quality=quality,
-                n=n
-            )
+            if self.budget:
+                # Checks the budget first and may fall back to a cheaper size/quality
+                response = self.budget.generate_image(
+                    self.client, "dall-e-3", prompt, size=size, quality=quality, n=n
+                )
+            else:
+                response = self.client.images.generate(
+                    model="dall-e-3",
+                    prompt=prompt,
+                    size=size,
+                    quality=quality,
+                    n=n
+                )
             
             # Extract and return the URLs of the generated images
             image_urls = [image.url for image in response.data]
             return image_urls
             
+        except BudgetExceeded:
+            # Let bulk callers tell "over budget" apart from a failed request
+            raise
         except Exception as e:
             print(f"Error generating image: {e}")
             return None
@@ -73,22 +88,32 @@ class DALLEImageGenerator:
             
         Returns:
             list: List of edited image URLs or None if there was an error
+            
+        Raises:
+            BudgetExceeded: If the request does not fit the configured budget
         """
         try:
             # Open and prepare the images
             with open(image_path, "rb") as image_file, open(mask_path, "rb") as mask_file:
-                response = self.client.images.edit(
-                    image=image_file,
-                    mask=mask_file,
-                    prompt=prompt,
-                    size=size,
-                    n=n
-                )
+                if self.budget:
+                    response = self.budget.edit_image(
+                        self.client, "dall-e-2", image_file, mask_file, prompt, size=size, n=n
+                    )
+                else:
+                    response = self.client.images.edit(
+                        image=image_file,
+                        mask=mask_file,
+                        prompt=prompt,
+                        size=size,
+                        n=n
+                    )
             
             # Extract and return the URLs of the edited images
             image_urls = [image.url for image in response.data]
             return image_urls
             
+        except BudgetExceeded:
+            raise
         except Exception as e:
             print(f"Error editing image: {e}")
             return None
@@ -104,20 +129,30 @@ class DALLEImageGenerator:
             
         Returns:
             list: List of image variation URLs or None if there was an error
+            
+        Raises:
+            BudgetExceeded: If the request does not fit the configured budget
         """
         try:
             # Open and prepare the image
             with open(image_path, "rb") as image_file:
-                response = self.client.images.create_variation(
-                    image=image_file,
-                    size=size,
-                    n=n
-                )
+                if self.budget:
+                    response = self.budget.create_image_variation(
+                        self.client, "dall-e-2", image_file, size=size, n=n
+                    )
+                else:
+                    response = self.client.images.create_variation(
+                        image=image_file,
+                        size=size,
+                        n=n
+                    )
             
             # Extract and return the URLs of the image variations
             image_urls = [image.url for image in response.data]
             return image_urls
             
+        except BudgetExceeded:
+            raise
         except Exception as e:
             print(f"Error creating image variation: {e}")
             return None
@@ -164,14 +199,19 @@ def main():
         return
     
     # Create an instance of the image generator
-    generator = DALLEImageGenerator()
+    budget = BudgetManager.from_env("dalle_image_generator")
+    generator = DALLEImageGenerator(budget=budget)
     
     # Example prompt for image generation
     prompt = "A futuristic city with flying cars and tall glass buildings at sunset"
     
     # Generate an image
     print(f"Generating image based on prompt: '{prompt}'")
-    image_urls = generator.generate_image(prompt)
+    try:
+        image_urls = generator.generate_image(prompt)
+    except BudgetExceeded as e:
+        print(e)
+        image_urls = None
     
     if image_urls:
         print(f"Generated {len(image_urls)} image(s):")
@@ -187,6 +227,9 @@ def main():
         if image:
             # Display image dimensions
             print(f"Image dimensions: {image.width} x {image.height}")
+    
+    # Record usage for capacity planning
+    print(f"Usage: {budget.save_summary()}")
 
 
 if __name__ == "__main__":
@@ -2,19 +2,26 @@ import os
 import openai
 import argparse
 import json
+from dataclasses import asdict
 from dotenv import load_dotenv
+from budget import BudgetExceeded, BudgetManager
+from result_store import SentimentResultStore
+from structured_output import (
+    SENTIMENT_SCHEMA, TOPICS_SCHEMA, SentimentResult, TopicResult, parse_structured, response_format
+)
 load_dotenv()
 class OpenAISentimentAnalyzer:
     """
     A class to analyze sentiment and extract insights from text using OpenAI's models.
     """
 
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, budget=None):
         """
         Initialize the OpenAI client with the API key.
         
         Args:
             api_key (str, optional): OpenAI API key. If not provided, will try to get from environment variable.
+            budget (BudgetManager, optional): Spend ceiling and usage accounting for analysis calls
         """
         # Use provided API key or try to get from environment
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
@@ -24,6 +31,19 @@ class OpenAISentimentAnalyzer:
             
         # Initialize the OpenAI client
         self.client = openai.OpenAI(api_key=self.api_key)
+        self.budget = budget
+    
+    def _create_completion(self, max_tokens, min_tokens=None, **kwargs):
+        """
+        Send a chat completion, through the budget manager when one is configured.
+        
+        min_tokens is the smallest max_tokens the budget may shrink the request to.
+        """
+        if self.budget:
+            return self.budget.create_chat_completion(
+                self.client, max_tokens=max_tokens, min_tokens=min_tokens, **kwargs
+            )
+        return self.client.chat.completions.create(max_tokens=max_tokens, **kwargs)
     
     def analyze_sentiment(self, text):
         """
@@ -33,7 +53,10 @@ class OpenAISentimentAnalyzer:
             text (str): The text to analyze
             
         Returns:
-            dict: Dictionary containing sentiment analysis results
+            SentimentResult: Sentiment analysis results, or None if analysis failed
+        
+        Raises:
+            BudgetExceeded: If the request does not fit the configured budget
         """
         prompt = f"""
         Analyze the sentiment of the following text and provide a detailed response in JSON format with these fields:
@@ -50,17 +73,20 @@ class OpenAISentimentAnalyzer:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = self._create_completion(
+                max_tokens=500,
+                model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.2,
-                response_format={"type": "json_object"}
+                response_format=response_format("sentiment_result", SENTIMENT_SCHEMA)
             )
             
-            # Parse the JSON response
-            result = json.loads(response.choices[0].message.content.strip())
-            return result
+            # Parse the JSON response, repairing near-valid output locally instead of retrying
+            result = parse_structured(response.choices[0].message.content or "", SENTIMENT_SCHEMA)
+            return SentimentResult(**result)
             
+        except BudgetExceeded:
+            raise
         except Exception as e:
             print(f"Error analyzing sentiment: {e}")
             return None
@@ -74,7 +100,10 @@ class OpenAISentimentAnalyzer:
             num_topics (int): Number of topics to extract
             
         Returns:
-            list: List of extracted topics
+            list: List of TopicResult objects, or None if extraction failed
+        
+        Raises:
+            BudgetExceeded: If the request does not fit the configured budget
         """
         prompt = f"""
         Extract the {num_topics} most important topics or themes from the following text.
@@ -83,7 +112,7 @@ class OpenAISentimentAnalyzer:
         - relevance_score: number between 0 and 1
         - related_terms: list of terms related to this topic mentioned in the text
         
-        Format the response as a JSON array of topic objects.
+        Format the response as a JSON object with a "topics" key holding an array of topic objects.
         
         Text to analyze:
         "{text}"
@@ -92,44 +121,59 @@ class OpenAISentimentAnalyzer:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            # A truncated strict-schema reply fails to parse, so refuse rather than shrink too far
+            response = self._create_completion(
+                max_tokens=800,
+                min_tokens=min(800, 120 * num_topics),
+                model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.2,
-                response_format={"type": "json_object"}
+                response_format=response_format("topics_result", TOPICS_SCHEMA)
             )
             
-            # Parse the JSON response
-            result = json.loads(response.choices[0].message.content.strip())
-            return result.get("topics", [])
+            # Parse the JSON response, repairing near-valid output locally instead of retrying
+            result = parse_structured(response.choices[0].message.content or "", TOPICS_SCHEMA)
+            return [TopicResult(**topic) for topic in result["topics"]]
             
+        except BudgetExceeded:
+            raise
         except Exception as e:
             print(f"Error extracting topics: {e}")
             return None
     
-    def analyze_text_batch(self, texts, analysis_type="sentiment"):
+    def analyze_text_batch(self, texts, analysis_type="sentiment", store=None):
         """
         Analyze a batch of texts.
         
         Args:
             texts (list): List of texts to analyze
             analysis_type (str): Type of analysis to perform (sentiment or topics)
+            store (SentimentResultStore, optional): Columnar store that sentiment results are
+                appended to instead of being collected in a list
             
         Returns:
-            list: List of analysis results
+            list: List of analysis results, or the store if one was provided
         """
-        results = []
+        if store is not None and analysis_type != "sentiment":
+            raise ValueError("A result store can only hold sentiment results")
+        
+        results = store if store is not None else []
         
         for i, text in enumerate(texts):
             print(f"Analyzing text {i+1}/{len(texts)}...")
             
-            if analysis_type == "sentiment":
-                result = self.analyze_sentiment(text)
-            elif analysis_type == "topics":
-                result = {"topics": self.extract_topics(text)}
-            else:
-                print(f"Unknown analysis type: {analysis_type}")
-                continue
+            try:
+                if analysis_type == "sentiment":
+                    result = self.analyze_sentiment(text)
+                elif analysis_type == "topics":
+                    result = {"topics": self.extract_topics(text)}
+                else:
+                    print(f"Unknown analysis type: {analysis_type}")
+                    continue
+            except BudgetExceeded as e:
+                # Keep what was analyzed so far and stop spending
+                print(f"Stopping batch: {e}")
+                break
                 
             results.append(result)
             
@@ -145,6 +189,9 @@ class OpenAISentimentAnalyzer:
             
         Returns:
             dict: Analysis results
+            
+        Raises:
+            BudgetExceeded: If the request does not fit the configured budget
         """
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
@@ -158,11 +205,49 @@ class OpenAISentimentAnalyzer:
                 print(f"Unknown analysis type: {analysis_type}")
                 return None
                 
+        except BudgetExceeded:
+            raise
         except Exception as e:
             print(f"Error reading or analyzing file: {e}")
             return None
 
 
+def run_batch(analyzer, args):
+    """
+    Analyze every line of a file, aggregating sentiment results in a columnar store.
+    
+    Args:
+        analyzer (OpenAISentimentAnalyzer): Analyzer to use
+        args (argparse.Namespace): Parsed command line arguments
+    """
+    with open(args.file, 'r', encoding='utf-8') as file:
+        texts = [line.strip() for line in file if line.strip()]
+    
+    columnar = bool(args.output) and args.output.endswith((".parquet", ".npz"))
+    if args.output and columnar != (args.type == "sentiment"):
+        print("Batch sentiment results are saved as .parquet or .npz, topic results as .json")
+        return
+    
+    print(f"Analyzing {len(texts)} texts from: {args.file}")
+    
+    if args.type == "sentiment":
+        store = analyzer.analyze_text_batch(texts, args.type, store=SentimentResultStore())
+        print("\nAggregated Results:")
+        print(json.dumps(store.summary(), indent=2))
+        
+        if args.output:
+            store.save(args.output)
+            print(f"\nResults saved to {args.output}")
+    else:
+        results = analyzer.analyze_text_batch(texts, args.type)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, default=asdict)
+            print(f"\nResults saved to {args.output}")
+        else:
+            print(json.dumps(results, indent=2, default=asdict))
+
+
 def main():
     """
     Command line interface for the OpenAI Sentiment Analyzer.
@@ -174,7 +259,10 @@ def main():
     parser.add_argument("--file", type=str, help="Path to file containing text to analyze")
     parser.add_argument("--type", type=str, choices=["sentiment", "topics"], default="sentiment",
                         help="Type of analysis to perform")
-    parser.add_argument("--output", type=str, help="Path to save analysis results (JSON format)")
+    parser.add_argument("--output", type=str,
+                        help="Path to save analysis results (.json, or .parquet/.npz for columnar batch results)")
+    parser.add_argument("--batch", action="store_true",
+                        help="Treat each non-empty line of --file as a separate text")
     
     args = parser.parse_args()
     
@@ -188,29 +276,42 @@ def main():
         return
     
     # Create analyzer instance
-    analyzer = OpenAISentimentAnalyzer()
+    budget = BudgetManager.from_env("sentiment_analyzer")
+    analyzer = OpenAISentimentAnalyzer(budget=budget)
+    
+    if args.batch:
+        if not args.file:
+            parser.error("--batch requires --file")
+        run_batch(analyzer, args)
+        print(f"\nUsage: {budget.save_summary()}")
+        return
     
     # Perform analysis
-    if args.file:
-        print(f"Analyzing file: {args.file}")
-        result = analyzer.analyze_file(args.file, args.type)
-    else:
-        print("Analyzing provided text")
-        if args.type == "sentiment":
-            result = analyzer.analyze_sentiment(args.text)
+    try:
+        if args.file:
+            print(f"Analyzing file: {args.file}")
+            result = analyzer.analyze_file(args.file, args.type)
         else:
-            result = {"topics": analyzer.extract_topics(args.text)}
+            print("Analyzing provided text")
+            if args.type == "sentiment":
+                result = analyzer.analyze_sentiment(args.text)
+            else:
+                result = {"topics": analyzer.extract_topics(args.text)}
+    except BudgetExceeded as e:
+        print(e)
+        result = None
+    budget.save_summary()
     
     # Display and save results
     if result:
         # Pretty print the result
         print("\nAnalysis Results:")
-        print(json.dumps(result, indent=2))
+        print(json.dumps(result, indent=2, default=asdict))
         
         # Save to file if requested
         if args.output:
             with open(args.output, 'w', encoding='utf-8') as f:
-                json.dump(result, f, indent=2)
+                json.dump(result, f, indent=2, default=asdict)
             print(f"\nResults saved to {args.output}")
     else:
         print("Analysis failed or returned no results")
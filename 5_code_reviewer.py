@@ -2,10 +2,16 @@ import openai
 import os
 import json
 from pathlib import Path
+from budget import BudgetExceeded, BudgetManager
+from hedging import HedgingPolicy
 class AICodeReviewer:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, hedging=None, budget=None):
         """Initialize the AI Code Reviewer"""
         self.client = openai.OpenAI(api_key=api_key or os.getenv('OPENAI_API_KEY'))
+        # Optional HedgingPolicy for cutting tail latency in interactive use
+        self.hedging = hedging
+        # Optional BudgetManager that caps spend across reviews
+        self.budget = budget
         
     def analyze_code(self, code, language="python", filename=""):
         """Analyze code and provide suggestions"""
@@ -32,18 +38,48 @@ class AICodeReviewer:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are an expert code reviewer with years of experience in software development."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1500
-            )
+            messages = [
+                {"role": "system", "content": "You are an expert code reviewer with years of experience in software development."},
+                {"role": "user", "content": prompt}
+            ]
+            
+            if self.hedging:
+                if not self.budget:
+                    return self.hedging.create_chat_completion(
+                        self.client, "gpt-4", messages, temperature=0.3, max_tokens=1500
+                    )
+                
+                # Every launched attempt is a paid request; streams carry no usage, so
+                # each one is accounted from local token counts under the model it used
+                max_tokens = self.budget.plan_chat("gpt-4", messages, 1500)
+                
+                def on_launch(model):
+                    self.budget.plan_chat(model, messages, max_tokens)
+                    self.budget.record_chat_prompt(model, messages)
+                
+                return self.hedging.create_chat_completion(
+                    self.client, "gpt-4", messages,
+                    on_launch=on_launch, on_finish=self.budget.record_chat_reply,
+                    temperature=0.3, max_tokens=max_tokens
+                )
+            
+            if self.budget:
+                response = self.budget.create_chat_completion(
+                    self.client, "gpt-4", messages, max_tokens=1500, temperature=0.3
+                )
+            else:
+                response = self.client.chat.completions.create(
+                    model="gpt-4",
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=1500
+                )
             
             return response.choices[0].message.content
             
+        except BudgetExceeded:
+            # Let batch callers stop instead of reporting it as a review
+            raise
         except Exception as e:
             return f"Error analyzing code: {str(e)}"
     
@@ -82,6 +118,8 @@ class AICodeReviewer:
             # Analyze the code
             return self.analyze_code(code, language, file_path.name)
             
+        except BudgetExceeded:
+            raise
         except Exception as e:
             return f"Error reading file: {str(e)}"
     
@@ -91,7 +129,11 @@ class AICodeReviewer:
         
         for file_path in file_paths:
             print(f"Reviewing: {file_path}")
-            results[file_path] = self.review_file(file_path)
+            try:
+                results[file_path] = self.review_file(file_path)
+            except BudgetExceeded as e:
+                print(f"{e}; skipping remaining {len(file_paths) - len(results)} file(s)")
+                break
         
         return results
     
@@ -116,7 +158,7 @@ def main():
     """Main function to demonstrate the code reviewer"""
     
     # Initialize the reviewer
-    reviewer = AICodeReviewer()
+    reviewer = AICodeReviewer(hedging=HedgingPolicy.from_env(), budget=BudgetManager.from_env("code_reviewer"))
     
     print("🔍 AI Code Reviewer")
     print("=" * 50)
@@ -133,7 +175,10 @@ def main():
         if choice == '1':
             file_path = input("Enter file path: ").strip()
             print("\n🔍 Analyzing...")
-            result = reviewer.review_file(file_path)
+            try:
+                result = reviewer.review_file(file_path)
+            except BudgetExceeded as e:
+                result = str(e)
             print("\n" + "="*50)
             print(result)
             
@@ -161,11 +206,17 @@ def main():
             language = input("Enter language (python/javascript/java/etc.): ").strip() or "python"
             
             print("\n🔍 Analyzing...")
-            result = reviewer.analyze_code(code, language)
+            try:
+                result = reviewer.analyze_code(code, language)
+            except BudgetExceeded as e:
+                result = str(e)
             print("\n" + "="*50)
             print(result)
             
         elif choice == '4':
+            if reviewer.hedging:
+                print(f"Hedging stats: {reviewer.hedging.stats.summary()}")
+            print(f"Usage: {reviewer.budget.save_summary()}")
             print("👋 Goodbye!")
             break
             
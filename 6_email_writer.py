@@ -1,14 +1,17 @@
 
 
 import os
+import openai
 from openai import OpenAI
 from dotenv import load_dotenv
+from hedging import HedgingPolicy
+from semantic_cache import SemanticCache
 
 # Load environment variables
 load_dotenv()
 
 class SimpleEmailWriter:
-    def __init__(self):
+    def __init__(self, hedging=None, cache=None):
         # Get API key from environment variable
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
@@ -16,6 +19,31 @@ class SimpleEmailWriter:
         
         # Initialize OpenAI client
         self.client = OpenAI(api_key=api_key)
+        
+        # Optional HedgingPolicy for cutting tail latency in interactive use
+        self.hedging = hedging
+        
+        # Optional SemanticCache so reworded requests reuse earlier emails
+        self.cache = cache
+    
+    def _complete(self, messages, max_tokens, temperature):
+        """
+        Send a chat completion, hedged when a HedgingPolicy is configured
+        """
+        if self.hedging:
+            return self.hedging.create_chat_completion(
+                self.client, "gpt-3.5-turbo", messages,
+                max_tokens=max_tokens, temperature=temperature
+            )
+        
+        response = self.client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        
+        return response.choices[0].message.content
     
     def write_email(self, purpose, recipient, key_points, tone="professional"):
         """
@@ -41,17 +69,21 @@ class SimpleEmailWriter:
             """
             
             # Get response from OpenAI
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that writes professional emails."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=500,
-                temperature=0.7
-            )
+            messages = [
+                {"role": "system", "content": "You are a helpful assistant that writes professional emails."},
+                {"role": "user", "content": prompt}
+            ]
             
-            return response.choices[0].message.content
+            if self.cache:
+                # Embed only the request itself so the prompt template doesn't dominate similarity.
+                # The recipient is matched exactly: a one-name difference would still look similar
+                return self.cache.get_or_create(
+                    f"{purpose}: {key_points}",
+                    lambda: self._complete(messages, max_tokens=500, temperature=0.7),
+                    namespace=f"email:{tone.strip().lower()}:{recipient.strip().lower()}"
+                )
+            
+            return self._complete(messages, max_tokens=500, temperature=0.7)
             
         except Exception as e:
             return f"Error writing email: {str(e)}"
@@ -69,9 +101,8 @@ class SimpleEmailWriter:
             Provide the improved version.
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
+            return self._complete(
+                [
                     {"role": "system", "content": "You are a helpful assistant that improves email writing."},
                     {"role": "user", "content": prompt}
                 ],
@@ -79,8 +110,6 @@ class SimpleEmailWriter:
                 temperature=0.5
             )
             
-            return response.choices[0].message.content
-            
         except Exception as e:
             return f"Error improving email: {str(e)}"
 
@@ -91,15 +120,16 @@ def main():
     
     try:
         # Initialize the email writer
-        writer = SimpleEmailWriter()
+        writer = SimpleEmailWriter(hedging=HedgingPolicy.from_env(), cache=SemanticCache.from_env(openai))
         
         while True:
             print("\nWhat would you like to do?")
             print("1. Write a new email")
             print("2. Improve an existing email")
-            print("3. Exit")
+            print("3. Report the last email as a wrong cached reply")
+            print("4. Exit")
             
-            choice = input("\nEnter your choice (1-3): ").strip()
+            choice = input("\nEnter your choice (1-4): ").strip()
             
             if choice == "1":
                 print("\n--- Write New Email ---")
@@ -129,6 +159,18 @@ def main():
                 print("-" * 40)
             
             elif choice == "3":
+                hit = writer.cache.report_false_hit() if writer.cache else None
+                if hit:
+                    print(f"\n🗑️ Dropped the cached email for: {hit['cached_prompt']}")
+                else:
+                    print("\nℹ️ The last email was not served from the cache.")
+            
+            elif choice == "4":
+                if writer.hedging:
+                    print(f"\nHedging stats: {writer.hedging.stats.summary()}")
+                if writer.cache:
+                    writer.cache.save()
+                    print(f"\nCache stats: {writer.cache.summary()}")
                 print("\nGoodbye! 👋")
                 break
             
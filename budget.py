@@ -0,0 +1,423 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+# USD per million tokens: (input, output)
+CHAT_PRICES = {
+    "gpt-4": (30.0, 60.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-3.5-turbo": (0.5, 1.5),
+    "text-embedding-3-small": (0.02, 0.0),
+}
+
+# USD per image: (model, size, quality)
+IMAGE_PRICES = {
+    ("dall-e-3", "1024x1024", "standard"): 0.04,
+    ("dall-e-3", "1024x1024", "hd"): 0.08,
+    ("dall-e-3", "1792x1024", "standard"): 0.08,
+    ("dall-e-3", "1792x1024", "hd"): 0.12,
+    ("dall-e-3", "1024x1792", "standard"): 0.08,
+    ("dall-e-3", "1024x1792", "hd"): 0.12,
+    ("dall-e-2", "1024x1024", "standard"): 0.02,
+    ("dall-e-2", "512x512", "standard"): 0.018,
+    ("dall-e-2", "256x256", "standard"): 0.016,
+}
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised when a request would take a job past its spend or token ceiling.
+    """
+
+
+def count_tokens(text, model="gpt-4"):
+    """
+    Count tokens locally, using tiktoken when it is installed.
+
+    Args:
+        text (str): Text to count
+        model (str): Model whose tokenizer should be used
+
+    Returns:
+        int: Token count (roughly four characters per token without tiktoken)
+    """
+    if tiktoken is None:
+        return (len(text) + 3) // 4
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(messages, model="gpt-4"):
+    """
+    Count the prompt tokens of a list of chat messages, including per-message overhead.
+    """
+    return sum(count_tokens(m["content"], model) + 4 for m in messages) + 3
+
+
+def _cheapest_image(model):
+    options = [(price, size, quality) for (m, size, quality), price in IMAGE_PRICES.items() if m == model]
+    return min(options)[1:] if options else None
+
+
+class BudgetManager:
+    """
+    Track spend across the client calls of a job and stop it at a ceiling.
+
+    Every request is estimated from local token counts before it is sent and rejected with
+    BudgetExceeded if it could cross max_cost or max_tokens. Actual usage from the response
+    is recorded afterwards. Once less than low_fraction of the budget remains, requests are
+    shrunk: smaller max_tokens for chat, standard quality and the smallest size for images.
+    """
+
+    def __init__(self, job="default", max_cost=None, max_tokens=None, low_fraction=0.2,
+                 min_completion_tokens=256, usage_path="usage_log.jsonl"):
+        """
+        Initialize the budget manager.
+
+        Args:
+            job (str): Name recorded in the usage summary
+            max_cost (float, optional): Spend ceiling in USD
+            max_tokens (int, optional): Ceiling on prompt plus completion tokens
+            low_fraction (float): Remaining budget fraction below which requests are shrunk
+            min_completion_tokens (int): Smallest max_tokens a chat request is shrunk to, unless
+                the call sets its own min_tokens
+            usage_path (str): JSON lines file that job summaries are appended to
+        """
+        self.job = job
+        self.max_cost = max_cost
+        self.max_tokens = max_tokens
+        self.low_fraction = low_fraction
+        self.min_completion_tokens = min_completion_tokens
+        self.usage_path = usage_path
+
+        self.started = time.time()
+        self.cost = 0.0
+        self.tokens = 0
+        self.calls = 0
+        self.rejected = 0
+        self.by_model = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                             "images": 0, "cost": 0.0})
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, job):
+        """
+        Build a budget from OPENAI_BUDGET_USD / OPENAI_BUDGET_TOKENS.
+
+        Args:
+            job (str): Name recorded in the usage summary
+
+        Returns:
+            BudgetManager: Budget for the job (unlimited, but still accounted, if neither is set)
+        """
+        max_cost = os.getenv("OPENAI_BUDGET_USD")
+        max_tokens = os.getenv("OPENAI_BUDGET_TOKENS")
+        return cls(
+            job=job,
+            max_cost=float(max_cost) if max_cost else None,
+            max_tokens=int(max_tokens) if max_tokens else None,
+        )
+
+    def remaining_fraction(self):
+        """
+        Return the smallest remaining fraction of the cost and token ceilings (1.0 if unlimited).
+        """
+        fractions = [1.0]
+        if self.max_cost:
+            fractions.append(1 - self.cost / self.max_cost)
+        if self.max_tokens:
+            fractions.append(1 - self.tokens / self.max_tokens)
+        return max(min(fractions), 0.0)
+
+    @property
+    def exhausted(self):
+        return self.remaining_fraction() <= 0.0
+
+    def _fits(self, cost, tokens):
+        return ((self.max_cost is None or self.cost + cost <= self.max_cost)
+                and (self.max_tokens is None or self.tokens + tokens <= self.max_tokens))
+
+    def _fit_completion_tokens(self, model, prompt_tokens, max_tokens):
+        """
+        Return the largest max_tokens (up to the given one) whose worst case still fits the budget.
+        """
+        fit = max_tokens
+        if self.max_tokens is not None:
+            fit = min(fit, self.max_tokens - self.tokens - prompt_tokens)
+        if self.max_cost is not None:
+            _, output_price = CHAT_PRICES.get(model, CHAT_PRICES["gpt-4"])
+            left = self.max_cost - self.cost - self.chat_cost(model, prompt_tokens, 0)
+            if output_price:
+                fit = min(fit, int(left * 1_000_000 / output_price))
+        return fit
+
+    def _check(self, cost, tokens):
+        with self._lock:
+            if not self._fits(cost, tokens):
+                self.rejected += 1
+                raise BudgetExceeded(
+                    f"Budget for job '{self.job}' exceeded: spent ${self.cost:.4f} and {self.tokens} tokens, "
+                    f"next request needs up to ${cost:.4f} and {tokens} tokens"
+                )
+
+    def _record(self, model, cost, prompt_tokens=0, completion_tokens=0, images=0, calls=1):
+        with self._lock:
+            self.calls += calls
+            self.cost += cost
+            self.tokens += prompt_tokens + completion_tokens
+            stats = self.by_model[model]
+            stats["calls"] += calls
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["images"] += images
+            stats["cost"] += cost
+
+    @staticmethod
+    def chat_cost(model, prompt_tokens, completion_tokens):
+        """
+        Price a chat request. Unknown models are priced like gpt-4 to err on the safe side.
+        """
+        input_price, output_price = CHAT_PRICES.get(model, CHAT_PRICES["gpt-4"])
+        return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+    @staticmethod
+    def image_cost(model, size, quality, n=1):
+        """
+        Price an image request. Unknown combinations are priced like the most expensive image.
+        """
+        return IMAGE_PRICES.get((model, size, quality), max(IMAGE_PRICES.values())) * n
+
+    def shape_chat(self, max_tokens, min_tokens=None):
+        """
+        Return the max_tokens to request, reduced as the budget runs low.
+
+        Args:
+            max_tokens (int): max_tokens the caller would normally use
+            min_tokens (int, optional): Smallest reply that is still useful to this caller,
+                defaulting to min_completion_tokens
+
+        Returns:
+            int: Possibly reduced max_tokens
+        """
+        remaining = self.remaining_fraction()
+        if remaining >= self.low_fraction:
+            return max_tokens
+        scaled = int(max_tokens * remaining / self.low_fraction)
+        return min(max_tokens, max(scaled, min_tokens or self.min_completion_tokens))
+
+    def shape_image(self, model, size, quality):
+        """
+        Return the (size, quality) to request, falling back to cheaper shapes when the budget runs low.
+        """
+        if self.remaining_fraction() >= self.low_fraction:
+            return size, quality
+        return _cheapest_image(model) or (size, "standard")
+
+    def create_chat_completion(self, client, model, messages, max_tokens=1000, min_tokens=None, **kwargs):
+        """
+        Send a chat completion within the budget and record its usage.
+
+        Args:
+            client: OpenAI client (or the openai module)
+            model (str): Chat model
+            messages (list): Chat messages
+            max_tokens (int): Upper bound on completion tokens before budget shaping
+            min_tokens (int, optional): Smallest max_tokens the request may be shrunk to; below
+                it the request is refused. Structured replies set this so they are not truncated
+            **kwargs: Extra arguments forwarded to chat.completions.create
+
+        Returns:
+            The chat completion response
+
+        Raises:
+            BudgetExceeded: If the worst-case cost of the request does not fit the budget
+        """
+        prompt_tokens, max_tokens = self._plan_chat(model, messages, max_tokens, min_tokens)
+        response = client.chat.completions.create(
+            model=model, messages=messages, max_tokens=max_tokens, **kwargs
+        )
+
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+        else:
+            completion_tokens = count_tokens(response.choices[0].message.content or "", model)
+        self._record(model, self.chat_cost(model, prompt_tokens, completion_tokens),
+                     prompt_tokens, completion_tokens)
+        return response
+
+    def _plan_chat(self, model, messages, max_tokens, min_tokens=None):
+        prompt_tokens = count_message_tokens(messages, model)
+        max_tokens = self.shape_chat(max_tokens, min_tokens)
+        # Shrink the reply rather than refuse while a useful one still fits
+        fit = self._fit_completion_tokens(model, prompt_tokens, max_tokens)
+        if fit >= (min_tokens or self.min_completion_tokens):
+            max_tokens = fit
+        self._check(self.chat_cost(model, prompt_tokens, max_tokens), prompt_tokens + max_tokens)
+        return prompt_tokens, max_tokens
+
+    def plan_chat(self, model, messages, max_tokens, min_tokens=None):
+        """
+        Budget a chat request sent outside create_chat_completion (e.g. a hedged stream).
+
+        Args:
+            model (str): Chat model
+            messages (list): Chat messages
+            max_tokens (int): max_tokens the caller would normally use
+            min_tokens (int, optional): Smallest max_tokens the request may be shrunk to
+
+        Returns:
+            int: max_tokens to send, shrunk to fit the remaining budget
+
+        Raises:
+            BudgetExceeded: If even the smallest useful request does not fit the budget
+        """
+        return self._plan_chat(model, messages, max_tokens, min_tokens)[1]
+
+    def record_chat_prompt(self, model, messages):
+        """
+        Record a chat request as soon as it is sent, from local token counts.
+
+        Used for streams, which carry no usage, and for hedged requests, where every
+        launched attempt pays for its prompt whether it wins or not.
+        """
+        prompt_tokens = count_message_tokens(messages, model)
+        self._record(model, self.chat_cost(model, prompt_tokens, 0), prompt_tokens)
+
+    def record_chat_reply(self, model, reply):
+        """
+        Record the completion tokens of a request already counted by record_chat_prompt.
+        """
+        completion_tokens = count_tokens(reply, model)
+        self._record(model, self.chat_cost(model, 0, completion_tokens),
+                     completion_tokens=completion_tokens, calls=0)
+
+    def generate_image(self, client, model, prompt, size="1024x1024", quality="standard", n=1, **kwargs):
+        """
+        Generate images within the budget and record their cost.
+
+        Args:
+            client: OpenAI client
+            model (str): Image model
+            prompt (str): Image description
+            size (str): Requested size before budget shaping
+            quality (str): Requested quality before budget shaping
+            n (int): Number of images
+            **kwargs: Extra arguments forwarded to images.generate
+
+        Returns:
+            The images response
+
+        Raises:
+            BudgetExceeded: If the images do not fit the budget
+        """
+        def send(size, quality):
+            image_kwargs = {"quality": quality} if model == "dall-e-3" else {}
+            return client.images.generate(model=model, prompt=prompt, size=size, n=n, **image_kwargs, **kwargs)
+
+        return self._image_request(model, size, quality, n, send)
+
+    def edit_image(self, client, model, image, mask, prompt, size="1024x1024", n=1, **kwargs):
+        """
+        Edit an image within the budget and record its cost.
+
+        Args:
+            client: OpenAI client
+            model (str): Image model
+            image: Open image file
+            mask: Open mask file
+            prompt (str): Description of the desired edits
+            size (str): Requested size before budget shaping
+            n (int): Number of images
+            **kwargs: Extra arguments forwarded to images.edit
+
+        Returns:
+            The images response
+
+        Raises:
+            BudgetExceeded: If the images do not fit the budget
+        """
+        def send(size, quality):
+            return client.images.edit(model=model, image=image, mask=mask, prompt=prompt, size=size, n=n, **kwargs)
+
+        return self._image_request(model, size, "standard", n, send)
+
+    def create_image_variation(self, client, model, image, size="1024x1024", n=1, **kwargs):
+        """
+        Create image variations within the budget and record their cost.
+
+        Args:
+            client: OpenAI client
+            model (str): Image model
+            image: Open image file
+            size (str): Requested size before budget shaping
+            n (int): Number of variations
+            **kwargs: Extra arguments forwarded to images.create_variation
+
+        Returns:
+            The images response
+
+        Raises:
+            BudgetExceeded: If the images do not fit the budget
+        """
+        def send(size, quality):
+            return client.images.create_variation(model=model, image=image, size=size, n=n, **kwargs)
+
+        return self._image_request(model, size, "standard", n, send)
+
+    def _image_request(self, model, size, quality, n, send):
+        size, quality = self.shape_image(model, size, quality)
+        if not self._fits(self.image_cost(model, size, quality, n), 0):
+            # Fall back to the cheapest shape before giving up
+            size, quality = _cheapest_image(model) or (size, quality)
+        cost = self.image_cost(model, size, quality, n)
+        self._check(cost, 0)
+
+        response = send(size, quality)
+        self._record(model, cost, images=len(response.data))
+        return response
+
+    def summary(self):
+        """
+        Return the job's usage as a dictionary.
+
+        Returns:
+            dict: Job name, duration, calls, tokens, cost and per-model breakdown
+        """
+        with self._lock:
+            return {
+                "job": self.job,
+                "started": self.started,
+                "duration_seconds": round(time.time() - self.started, 3),
+                "calls": self.calls,
+                "rejected": self.rejected,
+                "tokens": self.tokens,
+                "cost_usd": round(self.cost, 6),
+                "max_cost_usd": self.max_cost,
+                "max_tokens": self.max_tokens,
+                "by_model": {model: dict(stats, cost=round(stats["cost"], 6)) for model, stats in self.by_model.items()},
+            }
+
+    def save_summary(self):
+        """
+        Append the job's usage summary to usage_path for capacity planning.
+
+        Returns:
+            dict: The saved summary
+        """
+        summary = self.summary()
+        with open(self.usage_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary) + "\n")
+        return summary
@@ -0,0 +1,372 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ConversationStore:
+    """
+    Append-only on-disk store of chat turns, backed by SQLite.
+
+    Turns are keyed by (session_id, seq), so loading the last few turns of a session is an
+    index range scan regardless of how long the conversation is. The connection may be used
+    from any thread, but only one at a time; ChatServer funnels all calls through one thread.
+    """
+
+    def __init__(self, path="conversations.db"):
+        """
+        Open (or create) the conversation database.
+
+        Args:
+            path (str): SQLite database file
+        """
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS turns (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def last_seq(self, session_id):
+        """
+        Return the sequence number of the latest turn in a session, or 0 if it has none.
+        """
+        row = self.conn.execute(
+            "SELECT MAX(seq) FROM turns WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] or 0
+
+    def append(self, session_id, turns, start_seq):
+        """
+        Append turns to a session.
+
+        Args:
+            session_id (str): Conversation identifier
+            turns (list): Message dicts with role and content
+            start_seq (int): Sequence number of the first turn
+        """
+        now = time.time()
+        self.conn.executemany(
+            "INSERT INTO turns (session_id, seq, role, content, created) VALUES (?, ?, ?, ?, ?)",
+            [(session_id, start_seq + i, t["role"], t["content"], now) for i, t in enumerate(turns)],
+        )
+        self.conn.commit()
+
+    def load(self, session_id, limit):
+        """
+        Load what resuming a session needs: its recent turns and the next sequence number.
+
+        Returns:
+            tuple: (recent turns, next seq)
+        """
+        return self.recent(session_id, limit), self.last_seq(session_id) + 1
+
+    def recent(self, session_id, limit):
+        """
+        Load the most recent turns of a session, oldest first.
+
+        Args:
+            session_id (str): Conversation identifier
+            limit (int): Maximum number of turns to load
+
+        Returns:
+            list: Message dicts with role and content
+        """
+        rows = self.conn.execute(
+            "SELECT role, content FROM turns WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+            (session_id, limit),
+        ).fetchall()
+        return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+    def close(self):
+        self.conn.close()
+
+
+class _Session:
+    def __init__(self, turns, next_seq, context_turns):
+        self.turns = deque(turns, maxlen=context_turns)
+        self.next_seq = next_seq
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class ChatServer:
+    """
+    Serve many concurrent conversations from one async OpenAI client.
+
+    Only the most recently active sessions are kept in memory; idle ones are evicted and
+    reloaded from the ConversationStore with just their last context_turns turns. Store
+    reads and writes run on a single dedicated thread so disk I/O never blocks the event loop.
+    """
+
+    def __init__(self, client=None, store=None, model="gpt-4", context_turns=20, max_active=1000,
+                 system_prompt=None):
+        """
+        Initialize the chat server.
+
+        Args:
+            client (openai.AsyncOpenAI, optional): Shared upstream client
+            store (ConversationStore, optional): On-disk conversation store
+            model (str): Chat model
+            context_turns (int): Number of recent turns sent with each prompt
+            max_active (int): Number of sessions kept in the in-memory LRU
+            system_prompt (str, optional): System message prepended to every request
+        """
+        self.client = client or openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.store = store or ConversationStore()
+        self.model = model
+        self.context_turns = context_turns
+        self.max_active = max_active
+        self.system_prompt = system_prompt
+        self._active = OrderedDict()
+        self._store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-store")
+
+    async def _run_store(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._store_executor, func, *args)
+
+    async def _session(self, session_id):
+        session = self._active.get(session_id)
+        if session is not None:
+            self._active.move_to_end(session_id)
+            return session
+
+        turns, next_seq = await self._run_store(self.store.load, session_id, self.context_turns)
+        # Another request may have resumed the same session while this one was loading
+        session = self._active.get(session_id)
+        if session is not None:
+            self._active.move_to_end(session_id)
+            return session
+
+        session = _Session(turns, next_seq, self.context_turns)
+        self._active[session_id] = session
+        # Evict idle sessions; ones with requests in flight stay until their turns are stored
+        if len(self._active) > self.max_active:
+            for sid in list(self._active):
+                if len(self._active) <= self.max_active:
+                    break
+                if sid != session_id and not self._active[sid].pending:
+                    del self._active[sid]
+        return session
+
+    async def chat(self, session_id, prompt):
+        """
+        Send a prompt in a session and return the reply.
+
+        Args:
+            session_id (str): Conversation identifier
+            prompt (str): User message
+
+        Returns:
+            str: Assistant reply
+        """
+        session = await self._session(session_id)
+        session.pending += 1
+        try:
+            return await self._chat(session_id, session, prompt)
+        finally:
+            session.pending -= 1
+
+    async def _chat(self, session_id, session, prompt):
+        async with session.lock:
+            user_turn = {"role": "user", "content": prompt}
+            messages = list(session.turns) + [user_turn]
+            if self.system_prompt:
+                messages.insert(0, {"role": "system", "content": self.system_prompt})
+
+            response = await self.client.chat.completions.create(model=self.model, messages=messages)
+            reply = response.choices[0].message.content.strip()
+
+            assistant_turn = {"role": "assistant", "content": reply}
+            await self._run_store(self.store.append, session_id, [user_turn, assistant_turn], session.next_seq)
+            session.next_seq += 2
+            session.turns.extend([user_turn, assistant_turn])
+            return reply
+
+    def close(self):
+        """
+        Finish pending store writes and close the conversation store.
+        """
+        self._store_executor.shutdown(wait=True)
+        self.store.close()
+
+    async def handle_connection(self, reader, writer):
+        """
+        Line protocol: the first line names the session, each following line is a prompt.
+        Replies are written back as one JSON-encoded string per line.
+        """
+        try:
+            session_id = (await reader.readline()).decode().strip()
+            while session_id:
+                line = await reader.readline()
+                if not line:
+                    break
+                prompt = line.decode().strip()
+                if not prompt:
+                    continue
+                try:
+                    reply = await self.chat(session_id, prompt)
+                except Exception as e:
+                    reply = f"Error: {e}"
+                writer.write((json.dumps(reply) + "\n").encode())
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        """
+        Accept chat connections until cancelled.
+        """
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Chat server listening on {host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+async def _mock_upstream(reader, writer, delay):
+    """
+    Minimal OpenAI-compatible chat completions endpoint with simulated latency.
+    """
+    try:
+        while True:
+            header = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in header.decode().split("\r\n"):
+                if line.lower().startswith("content-length:"):
+                    length = int(line.split(":", 1)[1])
+            request = json.loads(await reader.readexactly(length)) if length else {}
+            await asyncio.sleep(random.uniform(*delay))
+
+            turns = len(request.get("messages", []))
+            body = json.dumps({
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "mock"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": f"reply with {turns} messages of context"},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": turns, "completion_tokens": 5, "total_tokens": turns + 5},
+            }).encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def benchmark(users=200, turns=5, sessions=5000, max_active=100, db_path="chat_bench.db"):
+    """
+    Drive the server with simulated users against a local mock upstream.
+
+    Args:
+        users (int): Concurrent simulated users
+        turns (int): Prompts each user sends
+        sessions (int): Distinct sessions users pick from, most of which end up idle
+        max_active (int): Size of the in-memory session LRU
+        db_path (str): Database file for the benchmark (recreated)
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    mock = await asyncio.start_server(lambda r, w: _mock_upstream(r, w, (0.05, 0.25)), "127.0.0.1", 0)
+    port = mock.sockets[0].getsockname()[1]
+    client = openai.AsyncOpenAI(api_key="mock", base_url=f"http://127.0.0.1:{port}/v1", max_retries=0)
+    server = ChatServer(client=client, store=ConversationStore(db_path), context_turns=10, max_active=max_active)
+
+    latencies = []
+
+    async def user(uid):
+        rng = random.Random(uid)
+        for _ in range(turns):
+            start = time.perf_counter()
+            await server.chat(f"session-{rng.randrange(sessions)}", "Hello again")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(users)))
+    elapsed = time.perf_counter() - start
+
+    # Resume cost should depend on context_turns, not on conversation length
+    long_id = "session-long"
+    server.store.append(long_id, [{"role": "user", "content": "x"}] * 50000, 1)
+    t = time.perf_counter()
+    server.store.recent(long_id, server.context_turns)
+    resume = time.perf_counter() - t
+
+    await client.close()
+    server.close()
+    mock.close()
+    await mock.wait_closed()
+
+    latencies.sort()
+    print(f"{users} users x {turns} turns over {sessions} sessions ({max_active} kept in memory)")
+    print(f"  throughput: {len(latencies) / elapsed:.0f} turns/s")
+    print(f"  latency p50: {latencies[len(latencies) // 2] * 1000:.0f}ms "
+          f"p99: {latencies[int(len(latencies) * 0.99)] * 1000:.0f}ms")
+    print(f"  active sessions in memory: {len(server._active)}")
+    print(f"  resume of a 50000-turn session: {resume * 1000:.2f}ms")
+
+
+def main():
+    """
+    Run the chat server or its benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Multi-session chat server backed by an on-disk conversation store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="Start the chat server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--db", default="conversations.db", help="Conversation database file")
+    serve.add_argument("--model", default="gpt-4")
+
+    bench = sub.add_parser("bench", help="Benchmark against a local mock upstream")
+    bench.add_argument("--users", type=int, default=200)
+    bench.add_argument("--turns", type=int, default=5)
+    bench.add_argument("--sessions", type=int, default=5000)
+    bench.add_argument("--max-active", type=int, default=100)
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        if not os.getenv("OPENAI_API_KEY"):
+            print("Warning: OPENAI_API_KEY not found in environment variables.")
+            return
+        server = ChatServer(store=ConversationStore(args.db), model=args.model)
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+    else:
+        asyncio.run(benchmark(args.users, args.turns, args.sessions, args.max_active))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class HedgeStats:
+    """
+    Counters describing how often requests were hedged and how much tail latency it saved.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.latency_saved = 0.0
+
+    def record_request(self, hedged):
+        with self._lock:
+            self.requests += 1
+            if hedged:
+                self.hedged += 1
+
+    def record_hedge_win(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def record_saved(self, seconds):
+        with self._lock:
+            self.latency_saved += max(seconds, 0.0)
+
+    @property
+    def hedge_rate(self):
+        return self.hedged / self.requests if self.requests else 0.0
+
+    def summary(self):
+        """
+        Return the counters as a dictionary.
+
+        Returns:
+            dict: Request count, hedge rate, hedge wins and first-token seconds saved (measured
+                when an abandoned attempt's response arrives before its timeout)
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_rate": round(self.hedge_rate, 3),
+                "hedge_wins": self.hedge_wins,
+                "latency_saved_seconds": round(self.latency_saved, 3),
+            }
+
+
+class _Attempt:
+    """
+    One streamed chat completion racing inside a hedged request.
+    """
+
+    def __init__(self, index, model, started_at):
+        self.index = index
+        self.model = model
+        self.started_at = started_at
+        self.first_token_at = None
+        self.error = None
+        self.result = None
+        self.stream = None
+        self.done = threading.Event()
+
+    def cancel(self):
+        """
+        Close the attempt's stream so its upstream request is dropped.
+        """
+        stream = self.stream
+        close = getattr(stream, "close", None)
+        if close:
+            try:
+                close()
+            except Exception:
+                pass
+
+
+class HedgingPolicy:
+    """
+    Send a duplicate chat completion when the first one is slow to produce its first token.
+
+    The hedge deadline is the p95 of recently observed time-to-first-token on the primary
+    model. When the primary has not streamed anything by then, the same messages are sent
+    to the fallback model; whichever streams first wins and the other stream is closed.
+    Each attempt runs on its own daemon thread with a request timeout, so a stalled loser
+    never delays new attempts or interpreter exit.
+    """
+
+    def __init__(self, fallback_model=None, initial_deadline=2.0, min_deadline=0.25,
+                 percentile=0.95, window=200, min_samples=20, attempt_timeout=60.0):
+        """
+        Initialize the hedging policy.
+
+        Args:
+            fallback_model (str, optional): Model used for the hedge. Defaults to the primary model.
+            initial_deadline (float): Hedge deadline in seconds until enough samples are collected
+            min_deadline (float): Lower bound on the hedge deadline in seconds
+            percentile (float): Percentile of first-token latency used as the deadline
+            window (int): Number of recent first-token latencies to keep
+            min_samples (int): Samples required before the percentile replaces initial_deadline
+            attempt_timeout (float): Request timeout in seconds for each attempt, bounding how
+                long an abandoned attempt can hold its connection
+        """
+        self.fallback_model = fallback_model
+        self.initial_deadline = initial_deadline
+        self.min_deadline = min_deadline
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.attempt_timeout = attempt_timeout
+        self.stats = HedgeStats()
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a policy from OPENAI_HEDGING / OPENAI_HEDGE_FALLBACK_MODEL, or None when disabled.
+
+        Returns:
+            HedgingPolicy: Configured policy or None if OPENAI_HEDGING is not set
+        """
+        if os.getenv("OPENAI_HEDGING", "").lower() not in ("1", "true", "yes", "on"):
+            return None
+        return cls(fallback_model=os.getenv("OPENAI_HEDGE_FALLBACK_MODEL") or None)
+
+    def deadline(self):
+        """
+        Return the current hedge deadline in seconds.
+        """
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.min_samples:
+            return self.initial_deadline
+        index = min(int(len(samples) * self.percentile), len(samples) - 1)
+        return max(samples[index], self.min_deadline)
+
+    def _observe(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def create_chat_completion(self, client, model, messages, on_launch=None, on_finish=None, **kwargs):
+        """
+        Run a chat completion with hedging and return the reply text.
+
+        Args:
+            client: OpenAI client (or the openai module) exposing chat.completions.create
+            model (str): Primary model
+            messages (list): Chat messages
+            on_launch (callable, optional): Called with the model before each attempt is sent.
+                If it raises for the primary the error propagates; for the hedge, no hedge is sent.
+            on_finish (callable, optional): Called with the model and the text streamed so far
+                once an attempt that got a response ends, whether it won, lost or failed
+            **kwargs: Extra arguments forwarded to chat.completions.create
+
+        Returns:
+            str: Content of the winning completion
+        """
+        state = {"winner": None, "failed": 0, "launched": 0}
+        cond = threading.Condition()
+        attempts = []
+
+        def run(attempt):
+            chunks = []
+            try:
+                attempt.stream = client.chat.completions.create(
+                    model=attempt.model, messages=messages, stream=True,
+                    timeout=self.attempt_timeout, **kwargs
+                )
+                if state["winner"] not in (None, attempt):
+                    # Lost the race while waiting for response headers: drop it right away
+                    attempt.first_token_at = time.monotonic()
+                    self._on_first_token(attempt, attempts, state, cond)
+                    return
+                for chunk in attempt.stream:
+                    if not chunk.choices:
+                        continue
+                    if attempt.first_token_at is None:
+                        attempt.first_token_at = time.monotonic()
+                        self._on_first_token(attempt, attempts, state, cond)
+                    if state["winner"] is not attempt:
+                        return
+                    chunks.append(chunk.choices[0].delta.content or "")
+                attempt.result = "".join(chunks)
+            except Exception as e:
+                attempt.error = e
+                with cond:
+                    state["failed"] += 1
+                    cond.notify_all()
+            finally:
+                attempt.cancel()
+                if on_finish and attempt.stream is not None:
+                    on_finish(attempt.model, "".join(chunks))
+                attempt.done.set()
+
+        def launch(target_model):
+            if on_launch:
+                on_launch(target_model)
+            attempt = _Attempt(len(attempts), target_model, time.monotonic())
+            attempts.append(attempt)
+            with cond:
+                state["launched"] += 1
+            threading.Thread(target=run, args=(attempt,), name=f"hedge-{attempt.index}", daemon=True).start()
+
+        launch(model)
+        with cond:
+            cond.wait_for(lambda: state["winner"] or state["failed"], timeout=self.deadline())
+            hedged = state["winner"] is None and not state["failed"]
+        if hedged:
+            try:
+                launch(self.fallback_model or model)
+            except Exception:
+                # on_launch refused the duplicate (e.g. no budget left); keep waiting on the primary
+                hedged = False
+        self.stats.record_request(hedged)
+
+        with cond:
+            cond.wait_for(lambda: state["winner"] or state["failed"] == state["launched"])
+            winner = state["winner"]
+        if winner is None:
+            raise attempts[0].error
+        winner.done.wait()
+        if winner.error is not None:
+            raise winner.error
+        return winner.result.strip()
+
+    def _on_first_token(self, attempt, attempts, state, cond):
+        elapsed = attempt.first_token_at - attempt.started_at
+        if attempt.index == 0:
+            self._observe(elapsed)
+        with cond:
+            if state["winner"] is None:
+                state["winner"] = attempt
+                if attempt.index > 0:
+                    self.stats.record_hedge_win()
+                cond.notify_all()
+                losers = [other for other in attempts if other is not attempt]
+            else:
+                losers = None
+                winner = state["winner"]
+        if losers is not None:
+            # Cancel the losers' upstream requests instead of waiting for them to respond
+            for other in losers:
+                other.cancel()
+            return
+        # The loser just produced its first token; the gap is what the hedge saved
+        if winner.index > 0 and attempt.index == 0:
+            self.stats.record_saved(attempt.first_token_at - winner.first_token_at)
+
+
+class _MockStream:
+    def __init__(self, text):
+        self.text = text
+        self.closed = False
+
+    def __iter__(self):
+        for word in self.text.split(" "):
+            if self.closed:
+                return
+            delta = type("Delta", (), {"content": word + " "})
+            yield type("Chunk", (), {"choices": [type("Choice", (), {"delta": delta})]})
+
+    def close(self):
+        self.closed = True
+
+
+class _MockClient:
+    """
+    Stand-in for the OpenAI client that injects first-token latency spikes.
+    """
+
+    def __init__(self, base_delay=0.05, spike_delay=1.5, spike_every=30):
+        self.base_delay = base_delay
+        self.spike_delay = spike_delay
+        self.spike_every = spike_every
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = type("Chat", (), {"completions": self})()
+
+    def create(self, model, messages, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            spike = self.calls % self.spike_every == 0
+        # Stall before the response headers, where a real slow upstream blocks
+        time.sleep(self.spike_delay if spike else self.base_delay)
+        return _MockStream(f"reply from {model}")
+
+
+def main():
+    """
+    Compare unhedged and hedged first-response latency against a mock with latency spikes.
+    """
+    messages = [{"role": "user", "content": "Hello"}]
+    rounds = 120
+
+    client = _MockClient()
+    plain = []
+    for _ in range(rounds):
+        start = time.monotonic()
+        "".join(c.choices[0].delta.content for c in client.create("gpt-4", messages, stream=True))
+        plain.append(time.monotonic() - start)
+
+    client = _MockClient()
+    policy = HedgingPolicy(fallback_model="gpt-3.5-turbo", min_samples=10)
+    hedged = []
+    for _ in range(rounds):
+        start = time.monotonic()
+        policy.create_chat_completion(client, "gpt-4", messages)
+        hedged.append(time.monotonic() - start)
+    time.sleep(client.spike_delay)
+
+    for name, samples in (("unhedged", plain), ("hedged", hedged)):
+        samples = sorted(samples)
+        p50 = samples[len(samples) // 2]
+        p99 = samples[min(int(len(samples) * 0.99), len(samples) - 1)]
+        print(f"{name:>9}: p50={p50 * 1000:.0f}ms p99={p99 * 1000:.0f}ms")
+    print("Hedge stats:", policy.stats.summary())
+
+
+if __name__ == "__main__":
+    main()
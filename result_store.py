@@ -0,0 +1,347 @@
+import os
+import random
+import time
+from array import array
+from collections import Counter, defaultdict
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+CATEGORICAL_COLUMNS = ("sentiment", "primary_emotion", "confidence")
+
+
+class SentimentResultStore:
+    """
+    Columnar storage for sentiment results with vectorized aggregations.
+
+    Scores are kept as a float32 column and sentiment, emotion and confidence as integer
+    codes into per-column label lists. Key phrases are stored as one flat code column plus
+    row offsets, so millions of rows cost a few bytes each instead of a dict per row.
+    Failed analyses are only counted, so each row records its position in the input.
+    """
+
+    def __init__(self):
+        self.failed = 0
+        self._rows = array("q")
+        self._scores = array("f")
+        self._codes = {name: array("i") for name in CATEGORICAL_COLUMNS}
+        self._phrase_codes = array("i")
+        self._phrase_offsets = array("q", [0])
+        self._labels = {name: [] for name in CATEGORICAL_COLUMNS + ("key_phrases",)}
+        self._index = {name: {} for name in self._labels}
+
+    def __len__(self):
+        return len(self._scores)
+
+    def _code(self, column, label):
+        index = self._index[column]
+        code = index.get(label)
+        if code is None:
+            code = index[label] = len(self._labels[column])
+            self._labels[column].append(label)
+        return code
+
+    def append(self, result):
+        """
+        Add one SentimentResult to the store.
+
+        Args:
+            result (SentimentResult): Result to add. None (a failed analysis) is only counted.
+        """
+        if result is None:
+            self.failed += 1
+            return
+        self._rows.append(len(self) + self.failed)
+        self._scores.append(result.sentiment_score)
+        for name in CATEGORICAL_COLUMNS:
+            # Free-form labels like primary_emotion are normalized so "Joy" and "joy" group together
+            self._codes[name].append(self._code(name, getattr(result, name).strip().lower()))
+        for phrase in result.key_phrases:
+            self._phrase_codes.append(self._code("key_phrases", phrase.strip().lower()))
+        self._phrase_offsets.append(len(self._phrase_codes))
+
+    def extend(self, results):
+        """
+        Add several SentimentResult objects to the store.
+
+        Args:
+            results (iterable): Results to add
+        """
+        for result in results:
+            self.append(result)
+
+    def rows(self):
+        """
+        Return the input position of each row as a NumPy array.
+        """
+        return np.frombuffer(self._rows, dtype=np.int64).copy()
+
+    def scores(self):
+        """
+        Return the sentiment scores as a NumPy array.
+        """
+        # Copy so callers holding the array don't block further appends to the buffer
+        return np.frombuffer(self._scores, dtype=np.float32).copy()
+
+    def codes(self, column):
+        """
+        Return the integer codes of a categorical column as a NumPy array.
+
+        Args:
+            column (str): One of sentiment, primary_emotion or confidence
+        """
+        return np.frombuffer(self._codes[column], dtype=np.int32).copy()
+
+    def labels(self, column):
+        """
+        Return the labels the codes of a column refer to.
+
+        Args:
+            column (str): One of sentiment, primary_emotion, confidence or key_phrases
+        """
+        return list(self._labels[column])
+
+    def score_histogram(self, bins=10, value_range=(-1.0, 1.0)):
+        """
+        Compute the distribution of sentiment scores.
+
+        Args:
+            bins (int): Number of equal-width bins
+            value_range (tuple): Lower and upper edge of the histogram
+
+        Returns:
+            tuple: (counts, bin_edges) NumPy arrays
+        """
+        return np.histogram(self.scores(), bins=bins, range=value_range)
+
+    def counts_by(self, column):
+        """
+        Count rows per label of a categorical column.
+
+        Args:
+            column (str): One of sentiment, primary_emotion or confidence
+
+        Returns:
+            dict: Label to row count
+        """
+        counts = np.bincount(self.codes(column), minlength=len(self._labels[column]))
+        return dict(zip(self._labels[column], counts.tolist()))
+
+    def mean_score_by(self, column):
+        """
+        Average sentiment score per label of a categorical column.
+
+        Args:
+            column (str): One of sentiment, primary_emotion or confidence
+
+        Returns:
+            dict: Label to mean score
+        """
+        codes = self.codes(column)
+        size = len(self._labels[column])
+        counts = np.bincount(codes, minlength=size)
+        sums = np.bincount(codes, weights=self.scores(), minlength=size)
+        means = np.divide(sums, counts, out=np.full(size, np.nan), where=counts > 0)
+        return dict(zip(self._labels[column], means.tolist()))
+
+    def top_key_phrases(self, n=10, sentiment=None):
+        """
+        Find the most frequent key phrases, optionally for one sentiment only.
+
+        Args:
+            n (int): Number of phrases to return
+            sentiment (str, optional): Only count phrases from rows with this sentiment
+
+        Returns:
+            list: (phrase, count) tuples, most frequent first
+        """
+        phrase_codes = np.frombuffer(self._phrase_codes, dtype=np.int32).copy()
+        if sentiment is not None:
+            if sentiment not in self._index["sentiment"]:
+                return []
+            offsets = np.frombuffer(self._phrase_offsets, dtype=np.int64).copy()
+            keep_rows = self.codes("sentiment") == self._index["sentiment"][sentiment]
+            # Expand the row mask to one entry per phrase using the row lengths
+            phrase_codes = phrase_codes[np.repeat(keep_rows, np.diff(offsets))]
+
+        counts = np.bincount(phrase_codes, minlength=len(self._labels["key_phrases"]))
+        n = min(n, int((counts > 0).sum()))
+        if n == 0:
+            return []
+        top = np.argpartition(-counts, n - 1)[:n]
+        top = top[np.argsort(-counts[top], kind="stable")]
+        return [(self._labels["key_phrases"][i], int(counts[i])) for i in top]
+
+    def summary(self, top_phrases=10):
+        """
+        Collect the standard aggregations into one dictionary.
+
+        Args:
+            top_phrases (int): Number of key phrases to include
+
+        Returns:
+            dict: Row counts, score statistics, per-sentiment means and top key phrases
+        """
+        scores = self.scores()
+        counts, edges = self.score_histogram()
+        return {
+            "rows": len(self),
+            "failed": self.failed,
+            "mean_score": float(scores.mean()) if len(scores) else None,
+            "score_histogram": {f"{lo:.1f}..{hi:.1f}": int(c) for lo, hi, c in zip(edges[:-1], edges[1:], counts)},
+            "sentiment_counts": self.counts_by("sentiment"),
+            "mean_score_by_sentiment": self.mean_score_by("sentiment"),
+            "mean_score_by_emotion": self.mean_score_by("primary_emotion"),
+            "top_key_phrases": self.top_key_phrases(top_phrases),
+        }
+
+    def save(self, path):
+        """
+        Write the store to a Parquet (.parquet) or NumPy (.npz) file.
+
+        Args:
+            path (str): Output file; the extension selects the format
+        """
+        if path.endswith(".parquet"):
+            if pa is None:
+                raise ImportError("Writing Parquet requires pyarrow: pip install pyarrow")
+            columns = {"row": pa.array(self.rows()), "sentiment_score": pa.array(self.scores())}
+            for name in CATEGORICAL_COLUMNS:
+                columns[name] = pa.DictionaryArray.from_arrays(self.codes(name), self._labels[name])
+            phrases = pa.DictionaryArray.from_arrays(
+                np.frombuffer(self._phrase_codes, dtype=np.int32), self._labels["key_phrases"]
+            )
+            offsets = pa.array(np.frombuffer(self._phrase_offsets, dtype=np.int64))
+            columns["key_phrases"] = pa.LargeListArray.from_arrays(offsets, phrases)
+            table = pa.table(columns).replace_schema_metadata({"failed": str(self.failed)})
+            pq.write_table(table, path)
+        else:
+            arrays = {
+                "failed": np.array(self.failed),
+                "row": self.rows(),
+                "sentiment_score": self.scores(),
+                "phrase_codes": np.frombuffer(self._phrase_codes, dtype=np.int32),
+                "phrase_offsets": np.frombuffer(self._phrase_offsets, dtype=np.int64),
+            }
+            for name, labels in self._labels.items():
+                arrays[f"{name}_labels"] = np.array(labels, dtype=str)
+            for name in CATEGORICAL_COLUMNS:
+                arrays[f"{name}_codes"] = self.codes(name)
+            np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a store written by save().
+
+        Args:
+            path (str): Parquet or .npz file
+
+        Returns:
+            SentimentResultStore: The loaded store
+        """
+        store = cls()
+        if path.endswith(".parquet"):
+            if pa is None:
+                raise ImportError("Reading Parquet requires pyarrow: pip install pyarrow")
+            table = pq.read_table(path)
+            store.failed = int((table.schema.metadata or {}).get(b"failed", 0))
+            store._rows = array("q", table.column("row").to_numpy().astype(np.int64).tobytes())
+            store._scores = array("f", table.column("sentiment_score").to_numpy().astype(np.float32).tobytes())
+            for name in CATEGORICAL_COLUMNS:
+                codes, labels = _dictionary_encode(table.column(name).combine_chunks())
+                store._codes[name] = array("i", codes.astype(np.int32).tobytes())
+                store._set_labels(name, labels)
+            phrases = table.column("key_phrases").combine_chunks()
+            codes, labels = _dictionary_encode(phrases.flatten())
+            store._phrase_codes = array("i", codes.astype(np.int32).tobytes())
+            offsets = phrases.offsets.to_numpy()
+            store._phrase_offsets = array("q", (offsets - offsets[0]).astype(np.int64).tobytes())
+            store._set_labels("key_phrases", labels)
+        else:
+            with np.load(path) as data:
+                store.failed = int(data["failed"])
+                store._rows = array("q", data["row"].astype(np.int64).tobytes())
+                store._scores = array("f", data["sentiment_score"].astype(np.float32).tobytes())
+                for name in CATEGORICAL_COLUMNS:
+                    store._codes[name] = array("i", data[f"{name}_codes"].astype(np.int32).tobytes())
+                store._phrase_codes = array("i", data["phrase_codes"].astype(np.int32).tobytes())
+                store._phrase_offsets = array("q", data["phrase_offsets"].astype(np.int64).tobytes())
+                for name in store._labels:
+                    store._set_labels(name, data[f"{name}_labels"].tolist())
+        return store
+
+    def _set_labels(self, column, labels):
+        self._labels[column] = list(labels)
+        self._index[column] = {label: code for code, label in enumerate(labels)}
+
+
+def _dictionary_encode(arrow_array):
+    if pa.types.is_dictionary(arrow_array.type):
+        arrow_array = arrow_array.cast(arrow_array.type.value_type)
+    encoded = arrow_array.dictionary_encode()
+    return encoded.indices.to_numpy(zero_copy_only=False), encoded.dictionary.to_pylist()
+
+
+def main():
+    """
+    Benchmark the columnar aggregations against the list-of-dicts results.
+    """
+    from structured_output import SentimentResult
+
+    rows = int(os.getenv("RESULT_STORE_BENCH_ROWS", "1000000"))
+    rng = random.Random(0)
+    sentiments = ["positive", "negative", "neutral", "mixed"]
+    emotions = ["joy", "anger", "sadness", "surprise", "fear", "trust"]
+    phrases = [f"phrase {i}" for i in range(500)]
+    results = [
+        SentimentResult(
+            sentiment=rng.choice(sentiments),
+            sentiment_score=rng.uniform(-1, 1),
+            primary_emotion=rng.choice(emotions),
+            confidence=rng.choice(["low", "medium", "high"]),
+            key_phrases=rng.sample(phrases, 3),
+        )
+        for _ in range(rows)
+    ]
+    dicts = [
+        {"sentiment": r.sentiment, "sentiment_score": r.sentiment_score, "primary_emotion": r.primary_emotion,
+         "confidence": r.confidence, "key_phrases": r.key_phrases}
+        for r in results
+    ]
+
+    start = time.perf_counter()
+    store = SentimentResultStore()
+    store.extend(results)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sums, counts = defaultdict(float), Counter()
+    for d in dicts:
+        sums[d["sentiment"]] += d["sentiment_score"]
+        counts[d["sentiment"]] += 1
+    {k: sums[k] / counts[k] for k in counts}
+    Counter(p for d in dicts for p in d["key_phrases"]).most_common(10)
+    Counter(min(int((d["sentiment_score"] + 1) * 5), 9) for d in dicts)
+    loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store.mean_score_by("sentiment")
+    store.top_key_phrases(10)
+    store.score_histogram()
+    vectorized = time.perf_counter() - start
+
+    print(f"{rows} rows")
+    print(f"  build columnar store: {build:.2f}s")
+    print(f"  list-of-dicts aggregation: {loop * 1000:.0f}ms")
+    print(f"  vectorized aggregation:    {vectorized * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Cache completions by prompt meaning rather than exact text.
+
+    Prompts are embedded and compared against a local NumPy index of unit vectors, so
+    "meeting request to John" can reuse the reply cached for "ask John for a meeting".
+    Entries are evicted least-recently-used once the cache is full and ignored once they
+    are older than max_age. The index is persisted to a directory between runs.
+    """
+
+    def __init__(self, client, path="semantic_cache", threshold=0.92, max_entries=2000,
+                 max_age=7 * 24 * 3600, embedding_model="text-embedding-3-small", audit_size=100):
+        """
+        Initialize the cache and load any previously saved index.
+
+        Args:
+            client: OpenAI client (or the openai module) exposing embeddings.create
+            path (str): Directory the index and audit log are stored in
+            threshold (float): Minimum cosine similarity for a cached reply to be reused
+            max_entries (int): Maximum number of cached replies
+            max_age (float): Seconds after which a cached reply is no longer served
+            embedding_model (str): Model used to embed prompts
+            audit_size (int): Number of recent hits kept in memory for auditing
+        """
+        self.client = client
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.embedding_model = embedding_model
+
+        self.lookups = 0
+        self.hits = 0
+        self.false_hits = 0
+        self.recent_hits = deque(maxlen=audit_size)
+        self._last_hit = None
+
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._namespace_ids = np.full(max_entries, -1, dtype=np.int32)
+        self._created = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._prompts = [None] * max_entries
+        self._responses = [None] * max_entries
+        self._namespaces = []
+        self._dirty = False
+        self.load()
+
+    @classmethod
+    def from_env(cls, client):
+        """
+        Build a cache from OPENAI_SEMANTIC_CACHE / OPENAI_SEMANTIC_CACHE_THRESHOLD, or None when disabled.
+
+        Args:
+            client: OpenAI client (or the openai module) exposing embeddings.create
+
+        Returns:
+            SemanticCache: Configured cache or None if OPENAI_SEMANTIC_CACHE is not set
+        """
+        path = os.getenv("OPENAI_SEMANTIC_CACHE")
+        if not path:
+            return None
+        if path.lower() in ("1", "true", "yes", "on"):
+            path = "semantic_cache"
+        threshold = float(os.getenv("OPENAI_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+        return cls(client, path=path, threshold=threshold)
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def summary(self):
+        """
+        Return cache counters as a dictionary.
+
+        Returns:
+            dict: Entry count, lookups, hit rate and reported false hits
+        """
+        return {
+            "entries": int((self._namespace_ids >= 0).sum()),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hit_rate, 3),
+            "false_hits": self.false_hits,
+        }
+
+    def embed(self, text):
+        """
+        Embed text and normalize it to a unit vector.
+
+        Args:
+            text (str): Text to embed
+
+        Returns:
+            numpy.ndarray: float32 unit vector
+        """
+        response = self.client.embeddings.create(model=self.embedding_model, input=text)
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, vector, namespace="default"):
+        """
+        Find the most similar live entry in a namespace.
+
+        Args:
+            vector (numpy.ndarray): Unit vector returned by embed()
+            namespace (str): Only entries stored under this namespace are considered
+
+        Returns:
+            tuple: (slot, similarity) of the best match, or (None, 0.0) below the threshold
+        """
+        with self._lock:
+            self.lookups += 1
+            if self._vectors is None or namespace not in self._namespaces:
+                return None, 0.0
+            scores = self._vectors @ vector
+            live = self._namespace_ids == self._namespaces.index(namespace)
+            if self.max_age:
+                live &= self._created >= time.time() - self.max_age
+            scores[~live] = -np.inf
+            slot = int(np.argmax(scores))
+            similarity = float(scores[slot])
+            if similarity < self.threshold:
+                return None, similarity
+            self.hits += 1
+            self._last_used[slot] = time.time()
+            self._dirty = True
+            return slot, similarity
+
+    def store(self, vector, prompt, response, namespace="default"):
+        """
+        Cache a reply, evicting the least recently used entry when full.
+
+        Args:
+            vector (numpy.ndarray): Unit vector returned by embed()
+            prompt (str): Prompt the reply was generated for
+            response (str): Reply to cache
+            namespace (str): Namespace the entry belongs to
+        """
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            if namespace not in self._namespaces:
+                self._namespaces.append(namespace)
+
+            free = np.flatnonzero(self._namespace_ids < 0)
+            if free.size:
+                slot = int(free[0])
+            else:
+                # Expired entries go first, then the least recently used one
+                expired = self._created < time.time() - self.max_age if self.max_age else None
+                if expired is not None and expired.any():
+                    slot = int(np.flatnonzero(expired)[0])
+                else:
+                    slot = int(np.argmin(self._last_used))
+
+            now = time.time()
+            self._vectors[slot] = vector
+            self._namespace_ids[slot] = self._namespaces.index(namespace)
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._prompts[slot] = prompt
+            self._responses[slot] = response
+            self._dirty = True
+
+    def get_or_create(self, prompt, create, namespace="default"):
+        """
+        Return a cached reply for a semantically similar prompt, or create and cache one.
+
+        Args:
+            prompt (str): Prompt to look up
+            create (callable): Called with no arguments to produce the reply on a miss
+            namespace (str): Keeps unrelated prompt families (chat, email tones...) apart
+
+        Returns:
+            str: Cached or newly created reply
+        """
+        self._last_hit = None
+        vector = self.embed(prompt)
+        slot, similarity = self.lookup(vector, namespace)
+        if slot is not None:
+            self._audit(prompt, slot, similarity, namespace)
+            return self._responses[slot]
+
+        response = create()
+        self.store(vector, prompt, response, namespace)
+        return response
+
+    def _audit(self, prompt, slot, similarity, namespace):
+        hit = {
+            "time": time.time(),
+            "namespace": namespace,
+            "query": prompt,
+            "cached_prompt": self._prompts[slot],
+            "similarity": round(similarity, 4),
+        }
+        self.recent_hits.append((slot, hit))
+        self._last_hit = (slot, hit)
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, "audit.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(hit) + "\n")
+
+    def report_false_hit(self):
+        """
+        Mark the last reply returned by get_or_create() as wrong and drop the entry behind it.
+
+        Returns:
+            dict: The audited hit, or None if the last reply was not served from the cache
+        """
+        if self._last_hit is None:
+            return None
+        slot, hit = self._last_hit
+        self._last_hit = None
+        with self._lock:
+            self.false_hits += 1
+            if self._prompts[slot] == hit["cached_prompt"]:
+                self._namespace_ids[slot] = -1
+                self._prompts[slot] = self._responses[slot] = None
+                self._dirty = True
+        return hit
+
+    def save(self):
+        """
+        Persist the index to the cache directory.
+        """
+        with self._lock:
+            if not self._dirty or self._vectors is None:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            np.savez(
+                os.path.join(self.path, "index.npz"),
+                vectors=self._vectors,
+                namespace_ids=self._namespace_ids,
+                created=self._created,
+                last_used=self._last_used,
+            )
+            with open(os.path.join(self.path, "entries.json"), "w", encoding="utf-8") as f:
+                json.dump({
+                    "embedding_model": self.embedding_model,
+                    "namespaces": self._namespaces,
+                    "prompts": self._prompts,
+                    "responses": self._responses,
+                }, f)
+            self._dirty = False
+
+    def load(self):
+        """
+        Load a previously saved index, dropping expired entries.
+        """
+        index_path = os.path.join(self.path, "index.npz")
+        entries_path = os.path.join(self.path, "entries.json")
+        if not (os.path.exists(index_path) and os.path.exists(entries_path)):
+            return
+
+        with open(entries_path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        if entries.get("embedding_model") != self.embedding_model:
+            return
+
+        with np.load(index_path) as index:
+            count = min(self.max_entries, index["namespace_ids"].shape[0])
+            # Keep the most recently used entries if max_entries shrank
+            order = np.argsort(-index["last_used"])[:count]
+            self._vectors = np.zeros((self.max_entries, index["vectors"].shape[1]), dtype=np.float32)
+            self._vectors[:count] = index["vectors"][order]
+            self._namespace_ids[:count] = index["namespace_ids"][order]
+            self._created[:count] = index["created"][order]
+            self._last_used[:count] = index["last_used"][order]
+        for i, j in enumerate(order):
+            self._prompts[i] = entries["prompts"][j]
+            self._responses[i] = entries["responses"][j]
+        self._namespaces = entries["namespaces"]
+
+        if self.max_age:
+            self._namespace_ids[self._created < time.time() - self.max_age] = -1
+
+
+def main():
+    """
+    Time lookup() against a full cache of random embeddings.
+    """
+    import tempfile
+
+    entries = int(os.getenv("SEMANTIC_CACHE_BENCH_ENTRIES", "2000"))
+    dims = 1536
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((entries, dims)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as path:
+        cache = SemanticCache(client=None, path=path, max_entries=entries)
+        for i, vector in enumerate(vectors):
+            cache.store(vector, f"prompt {i}", f"reply {i}", namespace=("chat", "email")[i % 2])
+
+        rounds = 1000
+        queries = vectors[rng.integers(0, entries, rounds)]
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            cache.lookup(query, namespace="chat")
+            timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    print(f"{entries} entries x {dims} dims, {rounds} lookups")
+    print(f"  lookup p50: {timings[len(timings) // 2] * 1000:.2f}ms "
+          f"p99: {timings[int(len(timings) * 0.99)] * 1000:.2f}ms")
+    print("  hit rate:", round(cache.hit_rate, 3))
+
+
+if __name__ == "__main__":
+    main()
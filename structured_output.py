@@ -0,0 +1,205 @@
+import json
+import re
+from dataclasses import dataclass
+
+
+SENTIMENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sentiment": {"type": "string", "enum": ["positive", "negative", "neutral", "mixed"]},
+        "sentiment_score": {"type": "number", "minimum": -1, "maximum": 1},
+        "primary_emotion": {"type": "string"},
+        "confidence": {"type": "string", "enum": ["low", "medium", "high"]},
+        "key_phrases": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["sentiment", "sentiment_score", "primary_emotion", "confidence", "key_phrases"],
+    "additionalProperties": False,
+}
+
+TOPICS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "topics": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "topic_name": {"type": "string"},
+                    "relevance_score": {"type": "number", "minimum": 0, "maximum": 1},
+                    "related_terms": {"type": "array", "items": {"type": "string"}},
+                },
+                "required": ["topic_name", "relevance_score", "related_terms"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["topics"],
+    "additionalProperties": False,
+}
+
+
+@dataclass
+class SentimentResult:
+    """
+    Sentiment analysis of a single text.
+    """
+    __slots__ = ("sentiment", "sentiment_score", "primary_emotion", "confidence", "key_phrases")
+    sentiment: str
+    sentiment_score: float
+    primary_emotion: str
+    confidence: str
+    key_phrases: list
+
+
+@dataclass
+class TopicResult:
+    """
+    A single topic extracted from a text.
+    """
+    __slots__ = ("topic_name", "relevance_score", "related_terms")
+    topic_name: str
+    relevance_score: float
+    related_terms: list
+
+
+def response_format(name, schema):
+    """
+    Build a strict JSON schema response_format for chat.completions.create.
+
+    Args:
+        name (str): Schema name reported to the API
+        schema (dict): JSON schema of the expected reply
+
+    Returns:
+        dict: Value for the response_format argument
+    """
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+
+_OUTSIDE_STRINGS = re.compile(r'"(?:\\.|[^"\\])*"|(,(?=\s*[}\]])|\bTrue\b|\bFalse\b|\bNone\b)')
+_FIXES = {",": "", "True": "true", "False": "false", "None": "null"}
+
+
+def repair_json(text):
+    """
+    Cheaply fix common near-valid JSON without another model call.
+
+    Handles code fences, leading or trailing prose, trailing commas, Python literals
+    and output truncated before its closing brackets.
+
+    Args:
+        text (str): Raw model output
+
+    Returns:
+        str: Text that is more likely to parse with json.loads
+    """
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.S)
+    if fenced:
+        text = fenced.group(1)
+
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return text
+    text = text[min(starts):]
+
+    out = []
+    stack = []
+    in_string = escaped = False
+    for ch in text:
+        out.append(ch)
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                # Drop any prose after the top-level value
+                break
+
+    if in_string:
+        out.append('"')
+    repaired = "".join(out).rstrip().rstrip(",:")
+    repaired += "".join(reversed(stack))
+
+    # Only rewrite outside string literals, which the alternation matches first
+    return _OUTSIDE_STRINGS.sub(lambda m: _FIXES.get(m.group(1), m.group(0)), repaired)
+
+
+def validate(value, schema):
+    """
+    Check a decoded value against the subset of JSON schema used here, coercing where cheap.
+
+    Numbers given as strings are converted, out-of-range numbers are clamped and enum
+    strings are lower-cased.
+
+    Args:
+        value: Decoded JSON value
+        schema (dict): JSON schema to validate against
+
+    Returns:
+        The validated value
+
+    Raises:
+        ValueError: If the value cannot be made to match the schema
+    """
+    kind = schema.get("type")
+    if kind == "object":
+        if not isinstance(value, dict):
+            raise ValueError(f"expected object, got {type(value).__name__}")
+        missing = [key for key in schema.get("required", []) if key not in value]
+        if missing:
+            raise ValueError(f"missing keys: {', '.join(missing)}")
+        return {key: validate(value[key], sub) for key, sub in schema["properties"].items() if key in value}
+    if kind == "array":
+        if not isinstance(value, list):
+            raise ValueError(f"expected array, got {type(value).__name__}")
+        return [validate(item, schema["items"]) for item in value]
+    if kind == "number":
+        if isinstance(value, bool):
+            raise ValueError("expected number, got boolean")
+        value = float(value)
+        if "minimum" in schema:
+            value = max(value, float(schema["minimum"]))
+        if "maximum" in schema:
+            value = min(value, float(schema["maximum"]))
+        return value
+    if kind == "string":
+        if not isinstance(value, str):
+            raise ValueError(f"expected string, got {type(value).__name__}")
+        if "enum" in schema:
+            value = value.strip().lower()
+            if value not in schema["enum"]:
+                raise ValueError(f"{value!r} is not one of {schema['enum']}")
+        return value
+    return value
+
+
+def parse_structured(text, schema):
+    """
+    Decode and validate a structured reply, repairing near-valid JSON locally.
+
+    Args:
+        text (str): Raw model output
+        schema (dict): JSON schema the output should follow
+
+    Returns:
+        dict: Validated data
+
+    Raises:
+        ValueError: If the text cannot be repaired into data matching the schema
+    """
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = json.loads(repair_json(text))
+    return validate(data, schema)